@@ -0,0 +1,289 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from sqlalchemy import func, insert, select, type_coerce
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from config import settings
+from database import (
+    Money,
+    from_cents,
+    to_cents,
+    ProductDB,
+    CustomerDB,
+    OrderDB,
+    OrderItemDB,
+    ProductSalesDB,
+    DailyCategorySalesDB,
+    CustomerSalesDB,
+)
+
+UNCATEGORIZED = "Uncategorized"
+CANCELLED = "cancelled"
+
+# Line revenue summed in the database as integer cents
+line_revenue = type_coerce(func.sum(OrderItemDB.price_at_purchase * OrderItemDB.quantity), Money)
+order_day = func.date(OrderDB.created_at)
+# Cancelled orders are kept in history but don't count as sales
+is_sale = OrderDB.status.is_distinct_from(CANCELLED)
+
+def _sales_between(query, start: Optional[date], end: Optional[date]):
+    """Restrict a query joined to orders to sales within an inclusive date range."""
+    query = query.filter(is_sale)
+    if start:
+        query = query.filter(OrderDB.created_at >= datetime.combine(start, time.min))
+    if end:
+        query = query.filter(OrderDB.created_at < datetime.combine(end + timedelta(days=1), time.min))
+    return query
+
+def _as_date(value) -> date:
+    """SQLite returns DATE() results as strings, Postgres as dates."""
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+# ============================================================================
+# Queries
+# ============================================================================
+
+def top_products(
+    db: Session,
+    limit: int,
+    order_by: str = "units",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> list[dict]:
+    """Best-selling products by units sold or revenue."""
+    if settings.analytics_rollups and start is None and end is None:
+        sort_column = ProductSalesDB.units_sold if order_by == "units" else ProductSalesDB.revenue
+        rows = (
+            db.query(
+                ProductSalesDB.product_id,
+                ProductDB.name,
+                ProductDB.category,
+                ProductSalesDB.units_sold,
+                ProductSalesDB.revenue,
+            )
+            .outerjoin(ProductDB, ProductDB.id == ProductSalesDB.product_id)
+            .filter(ProductSalesDB.units_sold > 0)
+            .order_by(sort_column.desc(), ProductSalesDB.product_id)
+            .limit(limit)
+            .all()
+        )
+    else:
+        units = func.sum(OrderItemDB.quantity)
+        query = (
+            db.query(
+                OrderItemDB.product_id,
+                ProductDB.name,
+                ProductDB.category,
+                units,
+                line_revenue,
+            )
+            .join(OrderDB, OrderDB.id == OrderItemDB.order_id)
+            .outerjoin(ProductDB, ProductDB.id == OrderItemDB.product_id)
+            .group_by(OrderItemDB.product_id, ProductDB.name, ProductDB.category)
+        )
+        query = _sales_between(query, start, end)
+        sort_column = units if order_by == "units" else line_revenue
+        rows = query.order_by(sort_column.desc(), OrderItemDB.product_id).limit(limit).all()
+
+    return [
+        {
+            "product_id": product_id,
+            "name": name,
+            "category": category,
+            "units_sold": units_sold or 0,
+            "revenue": revenue or from_cents(0),
+        }
+        for product_id, name, category, units_sold, revenue in rows
+    ]
+
+def revenue_by_category(
+    db: Session,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> list[dict]:
+    """Revenue and units sold per category per day."""
+    if settings.analytics_rollups:
+        query = db.query(
+            DailyCategorySalesDB.day,
+            DailyCategorySalesDB.category,
+            DailyCategorySalesDB.units_sold,
+            DailyCategorySalesDB.revenue,
+        ).filter(DailyCategorySalesDB.units_sold > 0)
+        if start:
+            query = query.filter(DailyCategorySalesDB.day >= start)
+        if end:
+            query = query.filter(DailyCategorySalesDB.day <= end)
+        rows = query.order_by(DailyCategorySalesDB.day, DailyCategorySalesDB.category).all()
+    else:
+        category = func.coalesce(ProductDB.category, UNCATEGORIZED)
+        query = (
+            db.query(order_day, category, func.sum(OrderItemDB.quantity), line_revenue)
+            .select_from(OrderItemDB)
+            .join(OrderDB, OrderDB.id == OrderItemDB.order_id)
+            .outerjoin(ProductDB, ProductDB.id == OrderItemDB.product_id)
+            .group_by(order_day, category)
+        )
+        query = _sales_between(query, start, end)
+        rows = query.order_by(order_day, category).all()
+
+    return [
+        {"day": _as_date(day), "category": category, "units_sold": units_sold, "revenue": revenue}
+        for day, category, units_sold, revenue in rows
+    ]
+
+def customer_lifetime_value(db: Session, limit: int) -> list[dict]:
+    """Customers ranked by total amount spent across all orders."""
+    if settings.analytics_rollups:
+        rows = (
+            db.query(
+                CustomerSalesDB.customer_id,
+                CustomerDB.name,
+                CustomerDB.email,
+                CustomerSalesDB.order_count,
+                CustomerSalesDB.lifetime_value,
+            )
+            .outerjoin(CustomerDB, CustomerDB.id == CustomerSalesDB.customer_id)
+            .filter(CustomerSalesDB.order_count > 0)
+            .order_by(CustomerSalesDB.lifetime_value.desc(), CustomerSalesDB.customer_id)
+            .limit(limit)
+            .all()
+        )
+    else:
+        lifetime_value = func.sum(OrderDB.total_price)
+        totals = (
+            db.query(
+                OrderDB.customer_id.label("customer_id"),
+                func.count(OrderDB.id).label("order_count"),
+                lifetime_value.label("lifetime_value"),
+            )
+            .filter(is_sale)
+            .group_by(OrderDB.customer_id)
+            .order_by(lifetime_value.desc(), OrderDB.customer_id)
+            .limit(limit)
+            .subquery()
+        )
+        rows = (
+            db.query(
+                totals.c.customer_id,
+                CustomerDB.name,
+                CustomerDB.email,
+                totals.c.order_count,
+                type_coerce(totals.c.lifetime_value, Money),
+            )
+            .outerjoin(CustomerDB, CustomerDB.id == totals.c.customer_id)
+            .order_by(totals.c.lifetime_value.desc(), totals.c.customer_id)
+            .all()
+        )
+
+    return [
+        {
+            "customer_id": customer_id,
+            "name": name,
+            "email": email,
+            "order_count": order_count,
+            "lifetime_value": lifetime_value,
+        }
+        for customer_id, name, email, order_count, lifetime_value in rows
+    ]
+
+# ============================================================================
+# Rollup maintenance
+# ============================================================================
+
+def _increment(db: Session, model, key: dict, **deltas):
+    """Atomically add deltas to a rollup row, creating it if missing.
+
+    Uses INSERT ... ON CONFLICT DO UPDATE so concurrent orders creating the
+    same row can't race each other into a unique key violation.
+    """
+    upsert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    columns = model.__mapper__.columns
+    stmt = upsert(model.__table__).values(
+        {columns[name]: value for name, value in {**key, **deltas}.items()}
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[columns[name] for name in key],
+        set_={
+            columns[name].name: columns[name] + stmt.excluded[columns[name].name]
+            for name in deltas
+        },
+    )
+    db.execute(stmt)
+
+def record_order_sales(db: Session, order: OrderDB, sign: int = 1):
+    """Apply an order to the rollup tables (sign=-1 removes it again).
+
+    Only orders that count as sales (not cancelled) should be applied.
+    Runs inside the caller's transaction so rollups commit with the order.
+    Categories are taken from the products at the time of the call; use
+    rebuild_sales_rollups to resync after recategorising products.
+    """
+    if not settings.analytics_rollups:
+        return
+
+    day = (order.created_at or datetime.utcnow()).date()
+    product_units: dict[int, int] = {}
+    product_cents: dict[int, int] = {}
+    category_units: dict[str, int] = {}
+    category_cents: dict[str, int] = {}
+    order_cents = 0
+
+    for item in order.items:
+        cents = to_cents(item.price_at_purchase) * item.quantity
+        category = (item.product.category if item.product else None) or UNCATEGORIZED
+        product_units[item.product_id] = product_units.get(item.product_id, 0) + item.quantity
+        product_cents[item.product_id] = product_cents.get(item.product_id, 0) + cents
+        category_units[category] = category_units.get(category, 0) + item.quantity
+        category_cents[category] = category_cents.get(category, 0) + cents
+        order_cents += cents
+
+    for product_id, units in product_units.items():
+        _increment(
+            db, ProductSalesDB, {"product_id": product_id},
+            units_sold=sign * units,
+            revenue=from_cents(sign * product_cents[product_id]),
+        )
+    for category, units in category_units.items():
+        _increment(
+            db, DailyCategorySalesDB, {"day": day, "category": category},
+            units_sold=sign * units,
+            revenue=from_cents(sign * category_cents[category]),
+        )
+    _increment(
+        db, CustomerSalesDB, {"customer_id": order.customer_id},
+        order_count=sign,
+        lifetime_value=from_cents(sign * order_cents),
+    )
+
+def rebuild_sales_rollups(db: Session):
+    """Recompute every rollup table from orders with INSERT ... SELECT."""
+    for model in (ProductSalesDB, DailyCategorySalesDB, CustomerSalesDB):
+        db.query(model).delete(synchronize_session=False)
+
+    revenue_cents = func.sum(OrderItemDB.price_at_purchase * OrderItemDB.quantity)
+    category = func.coalesce(ProductDB.category, UNCATEGORIZED)
+
+    db.execute(insert(ProductSalesDB).from_select(
+        ["product_id", "units_sold", "revenue_cents"],
+        select(OrderItemDB.product_id, func.sum(OrderItemDB.quantity), revenue_cents)
+        .join(OrderDB, OrderDB.id == OrderItemDB.order_id)
+        .where(is_sale)
+        .group_by(OrderItemDB.product_id),
+    ))
+    db.execute(insert(DailyCategorySalesDB).from_select(
+        ["day", "category", "units_sold", "revenue_cents"],
+        select(order_day, category, func.sum(OrderItemDB.quantity), revenue_cents)
+        .select_from(OrderItemDB)
+        .join(OrderDB, OrderDB.id == OrderItemDB.order_id)
+        .outerjoin(ProductDB, ProductDB.id == OrderItemDB.product_id)
+        .where(is_sale)
+        .group_by(order_day, category),
+    ))
+    db.execute(insert(CustomerSalesDB).from_select(
+        ["customer_id", "order_count", "lifetime_value_cents"],
+        select(OrderDB.customer_id, func.count(OrderDB.id), func.sum(OrderDB.total_price))
+        .where(is_sale)
+        .group_by(OrderDB.customer_id),
+    ))
+    db.commit()
@@ -55,10 +55,11 @@ def get_current_user(
     try:
         token = credentials.credentials
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        user_id: int = payload.get("sub")
+        user_id = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-    except JWTError:
+        user_id = int(user_id)
+    except (JWTError, ValueError):
         raise credentials_exception
     
     user = db.query(CustomerDB).filter(CustomerDB.id == user_id).first()
@@ -78,10 +79,10 @@ def get_current_user_optional(
     try:
         token = credentials.credentials
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        user_id: int = payload.get("sub")
+        user_id = payload.get("sub")
         if user_id is None:
             return None
-        user = db.query(CustomerDB).filter(CustomerDB.id == user_id).first()
+        user = db.query(CustomerDB).filter(CustomerDB.id == int(user_id)).first()
         return user
-    except (JWTError, AttributeError):
+    except (JWTError, AttributeError, ValueError):
         return None
@@ -21,6 +21,22 @@ class Settings(BaseSettings):
     rate_limit_requests: int = 100
     rate_limit_period: int = 60
     
+    # Batch reads
+    batch_max_ids: int = 100
+    
+    # Logging
+    log_format: str = "json"  # "json" or "text"
+    log_sample_rate: float = 1.0  # fraction of per-request INFO logs kept
+    sql_echo: bool = False
+    
+    # Inventory change feed
+    feed_buffer_size: int = 1024  # events kept for resuming and for slow subscribers
+    feed_max_subscribers: int = 10000
+    feed_heartbeat_seconds: float = 15.0
+    
+    # Analytics
+    analytics_rollups: bool = False
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
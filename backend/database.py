@@ -1,6 +1,8 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import create_engine, inspect, text, Column, Integer, BigInteger, String, Date, DateTime, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 from config import settings
 
@@ -8,8 +10,7 @@ from config import settings
 engine = create_engine(
     settings.database_url,
     connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {},
-    pool_pre_ping=True,  # Verify connections before using
-    echo=not settings.is_production  # Log SQL in development only
+    pool_pre_ping=True  # Verify connections before using
 )
 
 # Create SessionLocal class
@@ -18,13 +19,43 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create Base class
 Base = declarative_base()
 
+CENT = Decimal("0.01")
+
+def to_cents(amount) -> int:
+    """Convert a currency amount (float, str or Decimal) to integer minor units."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_cents(cents: int) -> Decimal:
+    """Convert integer minor units back to an exact Decimal amount."""
+    return (Decimal(int(cents)) / 100).quantize(CENT)
+
+class Money(TypeDecorator):
+    """Currency stored as integer minor units (cents), exposed as Decimal."""
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return from_cents(value)
+
+class BigMoney(Money):
+    """Money backed by a 64-bit column, for running totals that can pass $21M."""
+    impl = BigInteger
+    cache_ok = True
+
 # Database Models
 class ProductDB(Base):
     __tablename__ = "products"
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), index=True, nullable=False)
-    price = Column(Float, nullable=False)
+    price = Column("price_cents", Money, nullable=False)
     category = Column(String(100), index=True)
     inventory = Column(Integer, default=0)
 
@@ -40,10 +71,10 @@ class OrderDB(Base):
     __tablename__ = "orders"
     
     id = Column(Integer, primary_key=True, index=True)
-    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
-    total_price = Column(Float, nullable=False)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False, index=True)
+    total_price = Column("total_price_cents", Money, nullable=False)
     status = Column(String(50), default="pending")
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
     items = relationship("OrderItemDB", back_populates="order", cascade="all, delete-orphan")
     customer = relationship("CustomerDB")
@@ -52,14 +83,37 @@ class OrderItemDB(Base):
     __tablename__ = "order_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
-    price_at_purchase = Column(Float, nullable=False)
+    price_at_purchase = Column("price_at_purchase_cents", Money, nullable=False)
     
     order = relationship("OrderDB", back_populates="items")
     product = relationship("ProductDB")
 
+# Sales rollups (maintained incrementally when settings.analytics_rollups is on)
+class ProductSalesDB(Base):
+    __tablename__ = "product_sales"
+    
+    product_id = Column(Integer, primary_key=True, autoincrement=False)
+    units_sold = Column(Integer, nullable=False, default=0, index=True)
+    revenue = Column("revenue_cents", BigMoney, nullable=False, default=0)
+
+class DailyCategorySalesDB(Base):
+    __tablename__ = "daily_category_sales"
+    
+    day = Column(Date, primary_key=True)
+    category = Column(String(100), primary_key=True)
+    units_sold = Column(Integer, nullable=False, default=0)
+    revenue = Column("revenue_cents", BigMoney, nullable=False, default=0)
+
+class CustomerSalesDB(Base):
+    __tablename__ = "customer_sales"
+    
+    customer_id = Column(Integer, primary_key=True, autoincrement=False)
+    order_count = Column(Integer, nullable=False, default=0)
+    lifetime_value = Column("lifetime_value_cents", BigMoney, nullable=False, default=0, index=True)
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -68,16 +122,99 @@ def get_db():
     finally:
         db.close()
 
+# Float money columns from before the switch to integer minor units
+MONEY_COLUMN_MIGRATIONS = [
+    ("products", "price", "price_cents"),
+    ("orders", "total_price", "total_price_cents"),
+    ("order_items", "price_at_purchase", "price_at_purchase_cents"),
+]
+
+def migrate_money_columns():
+    """Convert legacy Float money columns to integer cents in place.
+
+    Each column is migrated once: the cents column is added, backfilled from
+    the float value and the old column is dropped. Already-migrated or fresh
+    tables are left untouched.
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    postgres = engine.dialect.name == "postgresql"
+
+    with engine.begin() as conn:
+        for table, old_column, new_column in MONEY_COLUMN_MIGRATIONS:
+            if table not in existing_tables:
+                continue
+            columns = {c["name"] for c in inspector.get_columns(table)}
+            if old_column not in columns or new_column in columns:
+                continue
+
+            logger.info("Migrating %s.%s to integer cents", table, old_column)
+            if postgres:
+                # Add nullable, backfill, then enforce NOT NULL so no DEFAULT is left
+                # behind and the schema matches a freshly created database
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {new_column} INTEGER"))
+            else:
+                # SQLite can only add a NOT NULL column with a default and can't
+                # drop it afterwards. The API always writes these columns
+                # (prices are required, order totals are computed), so the
+                # default is never used outside hand-written SQL.
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {new_column} INTEGER NOT NULL DEFAULT 0"))
+            conn.execute(text(
+                f"UPDATE {table} SET {new_column} = CAST(ROUND({old_column} * 100) AS INTEGER)"
+            ))
+            if postgres:
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {new_column} SET NOT NULL"))
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {old_column}"))
+            logger.info("Migrated %s.%s", table, old_column)
+
+# Rollup totals first created as 32-bit INTEGER columns
+ROLLUP_BIGINT_COLUMNS = [
+    ("product_sales", "revenue_cents"),
+    ("daily_category_sales", "revenue_cents"),
+    ("customer_sales", "lifetime_value_cents"),
+]
+
+def migrate_rollup_columns():
+    """Widen rollup money columns to BIGINT on PostgreSQL.
+
+    SQLite integers are already 64-bit, so only PostgreSQL needs altering.
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+
+    if "postgresql" not in settings.database_url:
+        return
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as conn:
+        for table, column in ROLLUP_BIGINT_COLUMNS:
+            if table not in existing_tables:
+                continue
+            types = {c["name"]: c["type"] for c in inspector.get_columns(table)}
+            if column in types and not isinstance(types[column], BigInteger):
+                logger.info("Widening %s.%s to BIGINT", table, column)
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE BIGINT"))
+
 # Initialize database
 def init_db():
     """Create all tables and seed initial data."""
     import logging
-    from sqlalchemy import text
     logger = logging.getLogger(__name__)
     
     try:
+        migrate_money_columns()
+        migrate_rollup_columns()
         Base.metadata.create_all(bind=engine)
-        logger.info("✅ Database tables created")
+        # create_all skips indexes added to tables that already exist
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+        logger.info("Database tables created")
         
         # Seed initial data if database is empty
         db = SessionLocal()
@@ -94,7 +231,7 @@ def init_db():
                     ProductDB(name="Chicken Breast", price=8.99, category="Meat", inventory=25),
                 ]
                 db.add_all(products)
-                logger.info("✅ Seeded products")
+                logger.info("Seeded products")
             
             if db.query(CustomerDB).count() == 0:
                 # Add initial customers (without passwords for now)
@@ -103,27 +240,27 @@ def init_db():
                     CustomerDB(name="Jane Smith", email="jane@example.com"),
                 ]
                 db.add_all(customers)
-                logger.info("✅ Seeded customers")
+                logger.info("Seeded customers")
             
             db.commit()
             
             # Sync sequences if using PostgreSQL (fixes 500 ID error)
             if "postgresql" in settings.database_url:
                 try:
-                    logger.info("🔄 Syncing PostgreSQL sequences...")
+                    logger.info("Syncing PostgreSQL sequences")
                     db.execute(text("SELECT setval('products_id_seq', (SELECT MAX(id) FROM products))"))
                     db.execute(text("SELECT setval('customers_id_seq', (SELECT MAX(id) FROM customers))"))
                     db.commit()
-                    logger.info("✅ Sequences synced")
+                    logger.info("Sequences synced")
                 except Exception as seq_err:
-                    logger.warning(f"⚠️ Could not sync sequences (might be first run): {seq_err}")
+                    logger.warning("Could not sync sequences (might be first run): %s", seq_err)
             
-            logger.info("✅ Database initialized with seed data")
+            logger.info("Database initialized with seed data")
         except Exception as e:
-            logger.error(f"❌ Error seeding database: {e}")
+            logger.error("Error seeding database: %s", e)
             db.rollback()
         finally:
             db.close()
     except Exception as e:
-        logger.error(f"❌ Error initializing database: {e}")
+        logger.error("Error initializing database: %s", e)
         raise
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import uuid
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Optional
+from config import settings
+from database import ProductDB
+
+def product_snapshot(product: ProductDB) -> dict:
+    """Current state of a product as sent on the change feed."""
+    return {
+        "id": product.id,
+        "name": product.name,
+        "price": float(product.price),
+        "category": product.category,
+        "inventory": product.inventory,
+    }
+
+def format_sse(event: dict, epoch: str) -> str:
+    """Encode a feed event as a Server-Sent Events message with id `<epoch>-<seq>`."""
+    return f"id: {epoch}-{event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+class FeedSubscription:
+    """A reserved subscriber slot on an InventoryBroadcaster.
+
+    Released when its stream finishes, or when it is garbage collected if
+    the stream was never started (e.g. the client went away first).
+    """
+
+    def __init__(self, feed: "InventoryBroadcaster"):
+        self._feed = feed
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._feed.subscriber_count -= 1
+
+    def __del__(self):
+        self.release()
+
+class InventoryBroadcaster:
+    """In-process fan-out of product and inventory changes.
+
+    Publishing appends to a ring buffer and resolves one shared future;
+    each subscriber then pulls whatever it has not seen yet, so publish
+    cost does not grow with the number of subscribers. Events carry a full
+    product snapshot, so a burst of changes to one product collapses into
+    its latest state for a subscriber that has not caught up. A subscriber
+    that falls behind the buffer gets a reset. Each worker process has its
+    own feed, identified by a random epoch in every event id so a client
+    resuming against a different feed is reset rather than replayed.
+    """
+
+    def __init__(self, buffer_size: int, max_subscribers: int):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.buffer: deque[dict] = deque(maxlen=buffer_size)
+        self.subscriber_count = 0
+        self.max_subscribers = max_subscribers
+        self._changed: Optional[asyncio.Future] = None
+
+    def publish_product(self, snapshot: dict):
+        self._publish({"type": "product", "product_id": snapshot["id"], "product": snapshot})
+
+    def publish_deleted(self, product_id: int):
+        self._publish({"type": "product_deleted", "product_id": product_id})
+
+    def _publish(self, event: dict):
+        self.seq += 1
+        event["seq"] = self.seq
+        self.buffer.append(event)
+        self._notify()
+
+    def _notify(self):
+        """Wake every subscriber waiting on the current future."""
+        if self._changed is not None and not self._changed.done():
+            self._changed.set_result(None)
+        self._changed = None
+
+    def _wait_future(self) -> asyncio.Future:
+        if self._changed is None:
+            self._changed = asyncio.get_running_loop().create_future()
+        return self._changed
+
+    def _format(self, event: dict) -> str:
+        return format_sse(event, self.epoch)
+
+    @property
+    def is_full(self) -> bool:
+        return self.subscriber_count >= self.max_subscribers
+
+    def subscribe(self) -> Optional[FeedSubscription]:
+        """Reserve a subscriber slot, or return None if the feed is full."""
+        if self.is_full:
+            return None
+        self.subscriber_count += 1
+        return FeedSubscription(self)
+
+    async def run_heartbeat(self, interval: float):
+        """Periodically wake every subscriber so idle connections send a keepalive."""
+        while True:
+            await asyncio.sleep(interval)
+            self._notify()
+
+    def resume_point(self, event_id: str) -> Optional[int]:
+        """Sequence number to resume from, or None if the id is from another feed."""
+        epoch, _, seq = event_id.strip().rpartition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def replay(self, since: int) -> Optional[list[dict]]:
+        """Coalesced events after `since`, or None if they are no longer buffered.
+
+        A `since` ahead of the current sequence comes from before a restart
+        or from another worker's feed, so it also needs a reset.
+        """
+        if since > self.seq:
+            return None
+        if since == self.seq:
+            return []
+        if not self.buffer or self.buffer[0]["seq"] > since + 1:
+            return None
+
+        latest: dict[int, dict] = {}
+        skip = since - self.buffer[0]["seq"] + 1
+        for event in islice(self.buffer, skip, None):
+            latest.pop(event["product_id"], None)
+            latest[event["product_id"]] = event
+        return list(latest.values())
+
+    async def stream(
+        self,
+        subscription: FeedSubscription,
+        since: Optional[int] = None,
+        reset: bool = False,
+    ) -> AsyncIterator[str]:
+        """Yield SSE messages for a subscriber until the client disconnects.
+
+        Takes a slot reserved with subscribe() and releases it when done.
+        A `reset` event tells the client to refetch /api/v1/products because
+        the requested history or its own backlog could not be delivered;
+        pass reset=True when the client's last event id came from another feed.
+        """
+        try:
+            # Events up to last_seq have been delivered (or superseded by a reset)
+            last_seq = self.seq
+            if reset:
+                yield self._format({"type": "reset", "seq": last_seq})
+            elif since is not None:
+                events = self.replay(since)
+                if events is None:
+                    yield self._format({"type": "reset", "seq": last_seq})
+                else:
+                    for event in events:
+                        yield self._format(event)
+            yield self._format({"type": "ready", "seq": last_seq})
+
+            while True:
+                if self.seq == last_seq:
+                    # Shielded so a disconnecting client can't cancel the shared future
+                    await asyncio.shield(self._wait_future())
+                    if self.seq == last_seq:
+                        yield ": keepalive\n\n"
+                        continue
+
+                events = self.replay(last_seq)
+                last_seq = self.seq
+                if events is None:
+                    yield self._format({"type": "reset", "seq": last_seq})
+                    continue
+                for event in events:
+                    yield self._format(event)
+        finally:
+            subscription.release()
+
+inventory_feed = InventoryBroadcaster(
+    buffer_size=settings.feed_buffer_size,
+    max_subscribers=settings.feed_max_subscribers,
+)
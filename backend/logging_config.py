@@ -0,0 +1,135 @@
+import atexit
+import copy
+import logging
+import queue
+import random
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from pythonjsonlogger.json import JsonFormatter
+from config import settings
+
+# Correlation id of the request currently being handled (None outside requests)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = "x-request-id"
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request id to every record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class RequestSamplingFilter(logging.Filter):
+    """Keep only a fraction of INFO/DEBUG records emitted while serving requests.
+
+    Warnings and errors, and anything logged outside a request (startup,
+    shutdown, migrations), are always kept.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        if getattr(record, "request_id", None) is None:
+            return True
+        return random.random() < self.rate
+
+class DeferredQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the listener thread.
+
+    The stock QueueHandler formats the full record on the calling thread;
+    here only the message arguments are merged (so mutable args can't change
+    before the listener runs) and exceptions are rendered to text.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # Uvicorn attaches an ANSI-coloured copy of its message as an extra
+        record.__dict__.pop("color_message", None)
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class RequestIdMiddleware:
+    """ASGI middleware that binds a correlation id to each HTTP request.
+
+    Reuses the caller's X-Request-ID header when present and echoes the id
+    back on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        # Not reset afterwards: each request runs in its own task context, and
+        # keeping the id lets the outer error handler log it too
+        request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.encode(), request_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_request_id)
+
+def configure_logging() -> QueueListener:
+    """Route root and uvicorn logging through a queue drained by a background thread.
+
+    Must run after uvicorn has applied its logging config, which is the
+    case when called while uvicorn imports the app module.
+    """
+    stream_handler = logging.StreamHandler()
+    if settings.log_format == "json":
+        stream_handler.setFormatter(JsonFormatter(
+            "%(asctime)s %(name)s %(levelname)s %(message)s %(request_id)s"
+        ))
+    else:
+        stream_handler.setFormatter(logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+        ))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.addFilter(RequestSamplingFilter(settings.log_sample_rate))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(logging.INFO if settings.is_production else logging.DEBUG)
+    # Uvicorn installs its own synchronous stream handlers and disables
+    # propagation; send its error and access logs through the queue instead
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+    # SQL statement logging goes through the queue instead of engine echo
+    logging.getLogger("sqlalchemy.engine").setLevel(
+        logging.INFO if settings.sql_echo else logging.WARNING
+    )
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -1,20 +1,30 @@
 # Grocery Store API - Production Ready
 # Version: 2.0.0
 
+import asyncio
 import logging
-from datetime import timedelta, datetime
-from typing import List, Optional, Literal
+from datetime import timedelta, datetime, date
+from typing import List, Optional, Literal, Union
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, status, Depends
+from fastapi import FastAPI, HTTPException, status, Depends, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, EmailStr
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 from config import settings
-from database import get_db, init_db, ProductDB, CustomerDB, OrderDB, OrderItemDB
+from database import get_db, init_db, to_cents, from_cents, ProductDB, CustomerDB, OrderDB, OrderItemDB
+from analytics import (
+    top_products,
+    revenue_by_category,
+    customer_lifetime_value,
+    record_order_sales,
+    rebuild_sales_rollups
+)
+from events import inventory_feed, product_snapshot
+from logging_config import configure_logging, RequestIdMiddleware
 from auth import (
     get_password_hash, 
     verify_password, 
@@ -23,22 +33,21 @@ from auth import (
     get_current_user_optional
 )
 
-# Logging configuration
-logging.basicConfig(
-    level=logging.INFO if settings.is_production else logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Logging configuration (JSON records written by a background queue listener)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Lifespan context manager for startup/shutdown events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    logger.info(f"🚀 Starting Grocery Store API in {settings.environment} mode")
+    logger.info("Starting Grocery Store API in %s mode", settings.environment)
     init_db()
+    heartbeat = asyncio.create_task(inventory_feed.run_heartbeat(settings.feed_heartbeat_seconds))
     yield
+    heartbeat.cancel()
     # Shutdown
-    logger.info("👋 Shutting down Grocery Store API")
+    logger.info("Shutting down Grocery Store API")
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -59,6 +68,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request ID Middleware (correlation id on every log line and response)
+app.add_middleware(RequestIdMiddleware)
+
 # Trusted Host Middleware (security)
 if settings.is_production:
     app.add_middleware(
@@ -118,6 +130,14 @@ class Order(BaseModel):
 class OrderStatusUpdate(BaseModel):
     status: Literal["pending", "completed", "cancelled"]
 
+class OrderBatchGet(BaseModel):
+    ids: List[int]
+
+class NotFound(BaseModel):
+    """Placeholder returned in batch reads for an id that does not exist."""
+    id: int
+    error: Literal["not_found"] = "not_found"
+
 class CustomerBase(BaseModel):
     name: str
     email: EmailStr
@@ -147,13 +167,33 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class ProductSales(BaseModel):
+    product_id: int
+    name: Optional[str] = None
+    category: Optional[str] = None
+    units_sold: int
+    revenue: float
+
+class CategoryRevenue(BaseModel):
+    day: date
+    category: str
+    units_sold: int
+    revenue: float
+
+class CustomerLifetimeValue(BaseModel):
+    customer_id: int
+    name: Optional[str] = None
+    email: Optional[str] = None
+    order_count: int
+    lifetime_value: float
+
 # ============================================================================
 # Exception Handlers
 # ============================================================================
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
-    logger.error(f"Global exception: {exc}", exc_info=True)
+    logger.error("Global exception: %s", exc, exc_info=True)
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "Internal server error" if settings.is_production else str(exc)}
@@ -182,7 +222,7 @@ async def register(customer: CustomerCreate, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(db_customer)
     
-    logger.info(f"New customer registered: {customer.email}")
+    logger.info("New customer registered: %s", customer.email)
     return db_customer
 
 @app.post("/api/v1/auth/login", response_model=LoginResponse, tags=["Authentication"])
@@ -197,9 +237,9 @@ async def login(credentials: LoginRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Create access token
-    access_token = create_access_token(data={"sub": customer.id})
+    access_token = create_access_token(data={"sub": str(customer.id)})
     
-    logger.info(f"User logged in: {customer.email}")
+    logger.info("User logged in: %s", customer.email)
     return {
         "access_token": access_token,
         "token_type": "bearer",
@@ -210,11 +250,36 @@ async def login(credentials: LoginRequest, db: Session = Depends(get_db)):
 # API Endpoints - Products
 # ============================================================================
 
-@app.get("/api/v1/products", response_model=List[Product], tags=["Products"])
-async def list_products(db: Session = Depends(get_db)):
-    """List all products in the grocery store."""
-    products = db.query(ProductDB).all()
-    return products
+def check_batch_size(ids: List[int]):
+    """Reject batch reads larger than the configured limit."""
+    if len(ids) > settings.batch_max_ids:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.batch_max_ids} ids can be requested at once"
+        )
+
+def in_request_order(ids: List[int], rows: list) -> list:
+    """Order batch results like the requested ids, marking missing ones."""
+    by_id = {row.id: row for row in rows}
+    return [by_id[i] if i in by_id else NotFound(id=i) for i in ids]
+
+@app.get("/api/v1/products", response_model=List[Union[Product, NotFound]], tags=["Products"])
+async def list_products(
+    ids: Optional[str] = Query(None, description="Comma-separated product IDs to fetch"),
+    db: Session = Depends(get_db)
+):
+    """List all products, or fetch specific products by ID in request order."""
+    if ids is None:
+        return db.query(ProductDB).all()
+    
+    try:
+        product_ids = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    check_batch_size(product_ids)
+    
+    products = db.query(ProductDB).filter(ProductDB.id.in_(set(product_ids))).all()
+    return in_request_order(product_ids, products)
 
 @app.post("/api/v1/products", response_model=Product, status_code=status.HTTP_201_CREATED, tags=["Products"])
 async def create_product(
@@ -227,7 +292,8 @@ async def create_product(
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
-    logger.info(f"Product created: {product.name}")
+    inventory_feed.publish_product(product_snapshot(db_product))
+    logger.info("Product created: %s", product.name)
     return db_product
 
 @app.get("/api/v1/products/{product_id}", response_model=Product, tags=["Products"])
@@ -256,7 +322,8 @@ async def update_product(
     
     db.commit()
     db.refresh(product)
-    logger.info(f"Product updated: {product.name}")
+    inventory_feed.publish_product(product_snapshot(product))
+    logger.info("Product updated: %s", product.name)
     return product
 
 @app.delete("/api/v1/products/{product_id}", tags=["Products"])
@@ -272,7 +339,8 @@ async def delete_product(
     
     db.delete(product)
     db.commit()
-    logger.info(f"Product deleted: ID {product_id}")
+    inventory_feed.publish_deleted(product_id)
+    logger.info("Product deleted: ID %s", product_id)
     return {"message": "Product deleted successfully", "id": product_id}
 
 # ============================================================================
@@ -285,6 +353,34 @@ async def get_inventory(db: Session = Depends(get_db)):
     products = db.query(ProductDB).all()
     return [{"product_id": p.id, "inventory": p.inventory} for p in products]
 
+@app.get("/api/v1/inventory/stream", tags=["Inventory"])
+async def stream_inventory(
+    since: Optional[str] = Query(None, description="Event id (`<epoch>-<seq>`) to resume after"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """Server-Sent Events feed of product and inventory changes.
+    
+    Resume with `since` (or the Last-Event-ID header sent by EventSource
+    on reconnect) to receive the changes made after that event. Ids from
+    another worker or a restarted process get a `reset` instead.
+    """
+    # Count the subscriber now, so concurrent requests can't all pass the cap
+    # before any of their streams has started
+    subscription = inventory_feed.subscribe()
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many inventory feed subscribers")
+    
+    resume_from = since if since is not None else last_event_id
+    resume_seq = None
+    if resume_from is not None:
+        # Ids from another worker or an earlier process can't be replayed here
+        resume_seq = inventory_feed.resume_point(resume_from)
+    return StreamingResponse(
+        inventory_feed.stream(subscription, resume_seq, reset=resume_from is not None and resume_seq is None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.put("/api/v1/inventory/{product_id}", tags=["Inventory"])
 async def update_inventory(
     product_id: int, 
@@ -298,8 +394,10 @@ async def update_inventory(
         raise HTTPException(status_code=404, detail="Product not found")
     
     product.inventory = quantity
+    snapshot = product_snapshot(product)
     db.commit()
-    logger.info(f"Inventory updated: Product {product_id} -> {quantity}")
+    inventory_feed.publish_product(snapshot)
+    logger.info("Inventory updated: Product %s -> %s", product_id, quantity)
     return {"product_id": product_id, "inventory": quantity, "message": "Inventory updated"}
 
 # ============================================================================
@@ -309,11 +407,17 @@ async def update_inventory(
 @app.post("/api/v1/orders", response_model=Order, status_code=status.HTTP_201_CREATED, tags=["Orders"])
 async def create_order(order: OrderCreate, db: Session = Depends(get_db)):
     """Place a new order."""
-    total_price = 0.0
+    product_ids = {item.productId for item in order.items}
+    products = {
+        p.id: p for p in db.query(ProductDB).filter(ProductDB.id.in_(product_ids)).all()
+    }
+    
+    # Totals are summed in integer cents so they stay exact for any order size
+    total_cents = 0
     order_items_data = []
     
     for item in order.items:
-        product = db.query(ProductDB).filter(ProductDB.id == item.productId).first()
+        product = products.get(item.productId)
         if not product:
             raise HTTPException(status_code=404, detail=f"Product {item.productId} not found")
         
@@ -321,8 +425,7 @@ async def create_order(order: OrderCreate, db: Session = Depends(get_db)):
             raise HTTPException(status_code=400, detail=f"Insufficient stock for {product.name}")
         
         product.inventory -= item.quantity
-        item_total = product.price * item.quantity
-        total_price += item_total
+        total_cents += to_cents(product.price) * item.quantity
         
         order_items_data.append({
             "product_id": item.productId,
@@ -332,7 +435,7 @@ async def create_order(order: OrderCreate, db: Session = Depends(get_db)):
     
     db_order = OrderDB(
         customer_id=order.customer_id,
-        total_price=round(total_price, 2),
+        total_price=from_cents(total_cents),
         status="pending"
     )
     db.add(db_order)
@@ -342,11 +445,29 @@ async def create_order(order: OrderCreate, db: Session = Depends(get_db)):
         db_item = OrderItemDB(order_id=db_order.id, **item_data)
         db.add(db_item)
     
+    db.flush()
+    record_order_sales(db, db_order)
+    snapshots = [product_snapshot(p) for p in products.values()]
     db.commit()
+    for snapshot in snapshots:
+        inventory_feed.publish_product(snapshot)
     db.refresh(db_order)
-    logger.info(f"Order created: ID {db_order.id}, Total: ${db_order.total_price}")
+    logger.info("Order created: ID %s, Total: $%s", db_order.id, db_order.total_price)
     return db_order
 
+@app.post("/api/v1/orders/batch-get", response_model=List[Union[Order, NotFound]], tags=["Orders"])
+async def batch_get_orders(batch: OrderBatchGet, db: Session = Depends(get_db)):
+    """Get several orders by ID in request order."""
+    check_batch_size(batch.ids)
+    
+    orders = (
+        db.query(OrderDB)
+        .options(selectinload(OrderDB.items))
+        .filter(OrderDB.id.in_(set(batch.ids)))
+        .all()
+    )
+    return in_request_order(batch.ids, orders)
+
 @app.get("/api/v1/orders/{order_id}", response_model=Order, tags=["Orders"])
 async def get_order(order_id: int, db: Session = Depends(get_db)):
     """Get order details by ID."""
@@ -367,10 +488,18 @@ async def update_order_status(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    # Keep sales rollups in step with orders moving into or out of "cancelled"
+    was_cancelled = order.status == "cancelled"
+    is_cancelled = status_update.status == "cancelled"
+    if is_cancelled and not was_cancelled:
+        record_order_sales(db, order, sign=-1)
+    elif was_cancelled and not is_cancelled:
+        record_order_sales(db, order, sign=1)
+    
     order.status = status_update.status
     db.commit()
     db.refresh(order)
-    logger.info(f"Order {order_id} status updated to: {status_update.status}")
+    logger.info("Order %s status updated to: %s", order_id, status_update.status)
     return order
 
 @app.delete("/api/v1/orders/{order_id}", tags=["Orders"])
@@ -384,14 +513,21 @@ async def cancel_order(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    restocked = {}
     for item in order.items:
         product = db.query(ProductDB).filter(ProductDB.id == item.product_id).first()
         if product:
             product.inventory += item.quantity
+            restocked[product.id] = product
     
+    if order.status != "cancelled":
+        record_order_sales(db, order, sign=-1)
+    snapshots = [product_snapshot(p) for p in restocked.values()]
     db.delete(order)
     db.commit()
-    logger.info(f"Order cancelled: ID {order_id}")
+    for snapshot in snapshots:
+        inventory_feed.publish_product(snapshot)
+    logger.info("Order cancelled: ID %s", order_id)
     return {"message": "Order cancelled successfully", "id": order_id}
 
 # ============================================================================
@@ -433,7 +569,7 @@ async def update_customer(
     
     db.commit()
     db.refresh(customer)
-    logger.info(f"Customer updated: {customer.email}")
+    logger.info("Customer updated: %s", customer.email)
     return customer
 
 @app.delete("/api/v1/customers/{customer_id}", tags=["Customers"])
@@ -452,9 +588,58 @@ async def delete_customer(
     
     db.delete(customer)
     db.commit()
-    logger.info(f"Customer deleted: ID {customer_id}")
+    logger.info("Customer deleted: ID %s", customer_id)
     return {"message": "Customer deleted successfully", "id": customer_id}
 
+# ============================================================================
+# API Endpoints - Analytics
+# ============================================================================
+
+@app.get("/api/v1/analytics/top-products", response_model=List[ProductSales], tags=["Analytics"])
+def get_top_products(
+    limit: int = Query(10, ge=1, le=100),
+    order_by: Literal["units", "revenue"] = "units",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Best-selling products by units sold or revenue, optionally within a date range."""
+    return top_products(db, limit, order_by, start, end)
+
+@app.get("/api/v1/analytics/revenue-by-category", response_model=List[CategoryRevenue], tags=["Analytics"])
+def get_revenue_by_category(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Revenue per category per day."""
+    return revenue_by_category(db, start, end)
+
+@app.get("/api/v1/analytics/customer-lifetime-value", response_model=List[CustomerLifetimeValue], tags=["Analytics"])
+def get_customer_lifetime_value(
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Customers ranked by total amount spent."""
+    return customer_lifetime_value(db, limit)
+
+@app.post("/api/v1/analytics/rollups/refresh", tags=["Analytics"])
+def refresh_rollups(
+    db: Session = Depends(get_db),
+    current_user: CustomerDB = Depends(get_current_user)
+):
+    """Rebuild the sales rollup tables from order history.
+    
+    Declared as a plain function so the rebuild runs in the threadpool
+    instead of blocking the event loop.
+    """
+    if not settings.analytics_rollups:
+        raise HTTPException(status_code=400, detail="Analytics rollups are disabled")
+    
+    rebuild_sales_rollups(db)
+    logger.info("Sales rollups rebuilt")
+    return {"message": "Sales rollups rebuilt"}
+
 # ============================================================================
 # Root & Health Endpoints
 # ============================================================================
@@ -487,5 +672,5 @@ async def health_check(db: Session = Depends(get_db)):
             "customers_count": customers_count
         }
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
+        logger.error("Health check failed: %s", e)
         raise HTTPException(status_code=503, detail="Service unavailable")
@@ -0,0 +1,84 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+from analytics import (
+    _increment,
+    top_products,
+    revenue_by_category,
+    customer_lifetime_value,
+    rebuild_sales_rollups,
+)
+from config import settings
+from database import ProductSalesDB
+from main import app
+
+def analytics_snapshot(rollups: bool, monkeypatch) -> tuple:
+    """Every analytics view computed either live or from the rollups."""
+    monkeypatch.setattr(settings, "analytics_rollups", rollups)
+    db = database.SessionLocal()
+    try:
+        return (
+            top_products(db, 100, "units"),
+            top_products(db, 100, "revenue"),
+            revenue_by_category(db),
+            customer_lifetime_value(db, 100),
+        )
+    finally:
+        db.close()
+
+@pytest.fixture
+def client(db_engine, monkeypatch):
+    monkeypatch.setattr(settings, "analytics_rollups", True)
+    with TestClient(app) as client:
+        yield client
+
+def place_order(client, customer_id: int, items: list[tuple[int, int]]) -> int:
+    response = client.post("/api/v1/orders", json={
+        "customer_id": customer_id,
+        "items": [{"productId": product_id, "quantity": quantity} for product_id, quantity in items],
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def test_increment_creates_then_accumulates(db_engine):
+    database.Base.metadata.create_all(bind=db_engine)
+    db = database.SessionLocal()
+    try:
+        for _ in range(3):
+            _increment(db, ProductSalesDB, {"product_id": 1}, units_sold=2, revenue=1.25)
+        _increment(db, ProductSalesDB, {"product_id": 1}, units_sold=-1, revenue=-0.5)
+        db.commit()
+
+        row = db.get(ProductSalesDB, 1)
+        assert row.units_sold == 5
+        assert str(row.revenue) == "3.25"
+    finally:
+        db.close()
+
+def test_rollups_match_live_queries(client, monkeypatch):
+    place_order(client, 1, [(1, 3), (2, 10)])
+    place_order(client, 1, [(3, 1), (1, 2)])
+    deleted = place_order(client, 2, [(6, 2)])
+    cancelled = place_order(client, 2, [(4, 1), (5, 4)])
+    restored = place_order(client, 2, [(5, 1)])
+
+    assert client.delete(f"/api/v1/orders/{deleted}").status_code == 200
+    for order_id, status in ((cancelled, "cancelled"), (restored, "cancelled"), (restored, "completed")):
+        response = client.patch(f"/api/v1/orders/{order_id}/status", json={"status": status})
+        assert response.status_code == 200
+
+    live = analytics_snapshot(False, monkeypatch)
+    assert analytics_snapshot(True, monkeypatch) == live
+
+    products_by_units = live[0]
+    assert [(p["product_id"], p["units_sold"]) for p in products_by_units] == [(2, 10), (1, 5), (3, 1), (5, 1)]
+    assert {c["customer_id"]: c["order_count"] for c in live[3]} == {1: 2, 2: 1}
+
+    # A full rebuild lands on the same numbers as incremental maintenance
+    db = database.SessionLocal()
+    try:
+        rebuild_sales_rollups(db)
+    finally:
+        db.close()
+    assert analytics_snapshot(True, monkeypatch) == live
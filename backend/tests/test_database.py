@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+from sqlalchemy import inspect, text
+
+import database
+from database import init_db, to_cents, from_cents, ProductDB, OrderDB
+
+LEGACY_SCHEMA = [
+    """CREATE TABLE products (
+        id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, price FLOAT NOT NULL,
+        category VARCHAR(100), inventory INTEGER)""",
+    """CREATE TABLE customers (
+        id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, email VARCHAR(255) NOT NULL,
+        hashed_password VARCHAR(255))""",
+    """CREATE TABLE orders (
+        id INTEGER PRIMARY KEY, customer_id INTEGER NOT NULL, total_price FLOAT NOT NULL,
+        status VARCHAR(50), created_at DATETIME)""",
+    """CREATE TABLE order_items (
+        id INTEGER PRIMARY KEY, order_id INTEGER NOT NULL, product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL, price_at_purchase FLOAT NOT NULL)""",
+    "INSERT INTO products VALUES (1, 'Organic Banana', 0.35, 'Fruits', 120)",
+    "INSERT INTO products VALUES (2, 'Chicken Breast', 8.99, 'Meat', 25)",
+    "INSERT INTO customers VALUES (1, 'John Doe', 'john@example.com', NULL)",
+    "INSERT INTO orders VALUES (1, 1, 9.69, 'pending', '2024-01-01 00:00:00')",
+    "INSERT INTO order_items VALUES (1, 1, 1, 2, 0.35)",
+    "INSERT INTO order_items VALUES (2, 1, 2, 1, 8.99)",
+]
+
+def test_to_cents_rounds_half_up():
+    assert to_cents(1.005) == 101
+    assert to_cents("0.125") == 13
+    assert to_cents(Decimal("-1.10")) == -110
+    assert to_cents(8.99) == 899
+    assert from_cents(899) == Decimal("8.99")
+
+def test_init_db_migrates_legacy_float_columns(db_engine):
+    with db_engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+
+    init_db()
+
+    inspector = inspect(db_engine)
+    assert {c["name"] for c in inspector.get_columns("products")} >= {"price_cents"}
+    assert "price" not in {c["name"] for c in inspector.get_columns("products")}
+    assert "total_price" not in {c["name"] for c in inspector.get_columns("orders")}
+    assert "price_at_purchase" not in {c["name"] for c in inspector.get_columns("order_items")}
+
+    with db_engine.connect() as conn:
+        assert conn.execute(text("SELECT id, price_cents FROM products ORDER BY id")).all() == [(1, 35), (2, 899)]
+        assert conn.execute(text("SELECT total_price_cents FROM orders")).scalar() == 969
+        assert conn.execute(
+            text("SELECT price_at_purchase_cents FROM order_items ORDER BY id")
+        ).scalars().all() == [35, 899]
+
+    db = database.SessionLocal()
+    try:
+        assert db.get(ProductDB, 2).price == Decimal("8.99")
+        assert db.get(OrderDB, 1).total_price == Decimal("9.69")
+    finally:
+        db.close()
+
+def test_init_db_migration_runs_once(db_engine):
+    with db_engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+
+    init_db()
+    init_db()
+
+    with db_engine.connect() as conn:
+        assert conn.execute(text("SELECT price_cents FROM products WHERE id = 1")).scalar() == 35
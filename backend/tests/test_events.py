@@ -0,0 +1,172 @@
+import asyncio
+import json
+import tracemalloc
+
+from events import InventoryBroadcaster
+
+def parse(message: str) -> dict:
+    """Decode the data line of an SSE message."""
+    for line in message.splitlines():
+        if line.startswith("data: "):
+            return json.loads(line[len("data: "):])
+    return {}
+
+def event_id(message: str) -> str:
+    """Return the id line of an SSE message."""
+    for line in message.splitlines():
+        if line.startswith("id: "):
+            return line[len("id: "):]
+    return ""
+
+def product(product_id: int, inventory: int) -> dict:
+    return {"id": product_id, "name": "Apple", "price": 1.25, "category": "Fruits", "inventory": inventory}
+
+async def take(stream, count: int) -> list[dict]:
+    return [parse(await stream.__anext__()) for _ in range(count)]
+
+def test_bursts_are_coalesced_per_product():
+    async def scenario():
+        feed = InventoryBroadcaster(buffer_size=16, max_subscribers=10)
+        stream = feed.stream(feed.subscribe())
+        assert (await take(stream, 1))[0]["type"] == "ready"
+
+        for inventory in (5, 4, 3):
+            feed.publish_product(product(1, inventory))
+        feed.publish_product(product(2, 9))
+
+        events = await take(stream, 2)
+        assert [(e["product_id"], e["product"]["inventory"]) for e in events] == [(1, 3), (2, 9)]
+        assert [e["seq"] for e in events] == [3, 4]
+        await stream.aclose()
+        assert feed.subscriber_count == 0
+
+    asyncio.run(scenario())
+
+def test_resume_replays_buffered_events():
+    async def scenario():
+        feed = InventoryBroadcaster(buffer_size=16, max_subscribers=10)
+        for inventory in (5, 4):
+            feed.publish_product(product(1, inventory))
+        feed.publish_deleted(2)
+
+        events = await take(feed.stream(feed.subscribe(), since=1), 3)
+        assert [e["type"] for e in events] == ["product", "product_deleted", "ready"]
+        assert events[0]["product"]["inventory"] == 4
+        assert events[2]["seq"] == 3
+
+    asyncio.run(scenario())
+
+def test_resume_outside_buffer_resets():
+    async def scenario():
+        feed = InventoryBroadcaster(buffer_size=2, max_subscribers=10)
+        for inventory in range(5):
+            feed.publish_product(product(1, inventory))
+
+        # Too old for the buffer
+        assert [e["type"] for e in await take(feed.stream(feed.subscribe(), since=1), 2)] == ["reset", "ready"]
+        # Ahead of the feed, e.g. from before a restart
+        assert [e["type"] for e in await take(feed.stream(feed.subscribe(), since=500), 2)] == ["reset", "ready"]
+
+    asyncio.run(scenario())
+
+def test_resume_from_another_feed_resets():
+    async def scenario():
+        feed_a = InventoryBroadcaster(buffer_size=16, max_subscribers=10)
+        feed_b = InventoryBroadcaster(buffer_size=16, max_subscribers=10)
+        for inventory in range(5):
+            feed_a.publish_product(product(1, inventory))
+        for inventory in range(12):
+            feed_b.publish_product(product(1 + inventory % 2, inventory))
+
+        stream = feed_a.stream(feed_a.subscribe())
+        last_id = event_id(await stream.__anext__())
+        assert last_id == f"{feed_a.epoch}-5"
+        assert feed_a.resume_point(last_id) == 5
+
+        # feed_b is ahead of seq 5, but the id belongs to feed_a's history
+        assert feed_b.resume_point(last_id) is None
+        assert feed_b.resume_point("5") is None
+        events = await take(feed_b.stream(feed_b.subscribe(), feed_b.resume_point(last_id), reset=True), 2)
+        assert [e["type"] for e in events] == ["reset", "ready"]
+
+    asyncio.run(scenario())
+
+def test_slow_subscriber_falling_behind_buffer_resets():
+    async def scenario():
+        feed = InventoryBroadcaster(buffer_size=4, max_subscribers=10)
+        stream = feed.stream(feed.subscribe())
+        await take(stream, 1)
+
+        for product_id in range(10):
+            feed.publish_product(product(product_id, 1))
+
+        assert (await take(stream, 1))[0] == {"type": "reset", "seq": 10}
+        feed.publish_product(product(1, 2))
+        assert (await take(stream, 1))[0]["seq"] == 11
+
+    asyncio.run(scenario())
+
+def test_disconnecting_subscriber_does_not_affect_others():
+    async def scenario():
+        feed = InventoryBroadcaster(buffer_size=16, max_subscribers=10)
+        streams = [feed.stream(feed.subscribe()) for _ in range(2)]
+        for stream in streams:
+            await take(stream, 1)
+        waiting = [asyncio.create_task(take(stream, 1)) for stream in streams]
+        await asyncio.sleep(0)
+
+        waiting[0].cancel()
+        await asyncio.sleep(0)
+        feed.publish_product(product(1, 7))
+
+        assert (await waiting[1])[0]["product"]["inventory"] == 7
+
+    asyncio.run(scenario())
+
+def test_subscriber_cap_counts_reserved_slots():
+    async def scenario():
+        feed = InventoryBroadcaster(buffer_size=16, max_subscribers=2)
+        first = feed.subscribe()
+        second = feed.subscribe()
+        # Neither stream has started, but both slots are taken
+        assert feed.subscribe() is None
+
+        stream = feed.stream(first)
+        await stream.__anext__()
+        await stream.aclose()
+        assert feed.subscriber_count == 1
+
+        # A stream that is never started releases its slot when dropped
+        unstarted = feed.stream(second)
+        del second, unstarted
+        assert feed.subscriber_count == 0
+        assert feed.subscribe() is not None
+
+    asyncio.run(scenario())
+
+def test_idle_subscribers_cost_little_memory():
+    subscribers = 2000
+
+    async def scenario():
+        feed = InventoryBroadcaster(buffer_size=1024, max_subscribers=subscribers)
+        streams = [feed.stream(feed.subscribe()) for _ in range(subscribers)]
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for stream in streams:
+            await stream.__anext__()  # "ready"
+        # Park every subscriber waiting for the next change
+        waiting = [asyncio.create_task(stream.__anext__()) for stream in streams]
+        await asyncio.sleep(0)
+        per_subscriber = (tracemalloc.get_traced_memory()[0] - before) / subscribers
+        tracemalloc.stop()
+
+        assert feed.subscriber_count == subscribers
+        # A parked generator plus its task and shielded wait, well under 4 KB
+        assert per_subscriber < 4096, f"{per_subscriber:.0f} bytes per idle subscriber"
+
+        feed.publish_product(product(1, 1))
+        delivered = await asyncio.gather(*waiting)
+        assert all(parse(message)["product_id"] == 1 for message in delivered)
+
+    asyncio.run(scenario())